@@ -4,7 +4,7 @@ Cartographer - Repository mapping and change detection.
 
 Commands:
   init     Initialize mapping (create hashes + empty codemaps)
-  changes  Show what changed (read-only, like git status)
+  changes  Show what changed (like git status; touches nothing but the digest cache)
   update   Update hashes (like git commit)
 
 Usage:
@@ -14,20 +14,56 @@ Usage:
 """
 
 import argparse
+import functools
 import hashlib
 import json
+import mmap
 import os
+import queue
 import re
 import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 VERSION = "1.0.0"
 STATE_DIR = ".slim"
 STATE_FILE = "cartography.json"
+HASH_CACHE_FILE = "hash.cache"
 CODEMAP_FILE = "codemap.md"
 
+# Below this many files the pool setup costs more than it saves.
+PARALLEL_HASH_MIN_FILES = 64
+
+# Hashing threads double as I/O queue depth: reads block in C and the
+# hashers release the GIL on large buffers, so oversubscribing the cores
+# keeps many reads in flight while digests run.
+HASH_QUEUE_DEPTH = min(32, (os.cpu_count() or 1) * 4)
+
+# Content digests only need to detect change, not resist attack. Prefer the
+# much faster BLAKE3 or xxHash when installed; fall back to stdlib MD5.
+try:
+    from blake3 import blake3 as new_hasher  # type: ignore[import-not-found]
+
+    HASH_ALGO = "blake3"
+except ImportError:
+    try:
+        from xxhash import xxh3_128 as new_hasher  # type: ignore[import-not-found]
+
+        HASH_ALGO = "xxh3_128"
+    except ImportError:
+        new_hasher = hashlib.md5
+        HASH_ALGO = "md5"
+
+# Optional: much faster (de)serialization of large state files.
+try:
+    import orjson  # type: ignore[import-not-found]
+except ImportError:
+    orjson = None
+
 
 def load_gitignore(root: Path) -> List[str]:
     """Load .gitignore patterns."""
@@ -42,120 +78,451 @@ def load_gitignore(root: Path) -> List[str]:
     return patterns
 
 
+_GLOB_MAGIC = frozenset("*?[")
+
+
+@functools.lru_cache(maxsize=128)
+def _split_literal_patterns(
+    patterns: Tuple[str, ...],
+) -> Tuple[frozenset, Tuple[str, ...], Tuple[str, ...]]:
+    """Partition patterns into literal names, literal dir prefixes, and globs.
+
+    Most gitignore entries are plain names like "node_modules/" or "dist";
+    matching those with string operations avoids the combined regex.
+    """
+    names: List[str] = []
+    prefixes: List[str] = []
+    globs: List[str] = []
+    for pattern in patterns:
+        if pattern.startswith("/") or not _GLOB_MAGIC.isdisjoint(pattern):
+            globs.append(pattern)
+        elif pattern.endswith("/"):
+            prefixes.append(pattern)
+        elif "/" in pattern:
+            globs.append(pattern)
+        else:
+            names.append(pattern)
+    return frozenset(names), tuple(prefixes), tuple(globs)
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_patterns(patterns: Tuple[str, ...]) -> Optional[re.Pattern]:
+    """Build the combined anchored regex for a pattern tuple, cached per process.
+
+    The result is ^-anchored so it is used with match(), sparing the
+    engine the per-position scan that search() performs.
+    """
+    if not patterns:
+        return None
+
+    regex_parts = []
+    for pattern in patterns:
+        reg = re.escape(pattern)
+        reg = reg.replace(r'\*\*/', '(?:.*/)?')
+        reg = reg.replace(r'\*\*', '.*')
+        reg = reg.replace(r'\*', '[^/]*')
+        reg = reg.replace(r'\?', '.')
+
+        if pattern.endswith('/'):
+            reg += '.*'
+
+        if pattern.startswith('/'):
+            reg = reg[1:]
+        else:
+            reg = '(?:.*/)?' + reg
+
+        regex_parts.append(f'(?:{reg}$)')
+
+    return re.compile('^(?:' + '|'.join(regex_parts) + ')')
+
+
 class PatternMatcher:
-    """Match paths against glob patterns using compiled regex."""
+    """Match paths against glob patterns, with string fast paths for literals."""
 
     def __init__(self, patterns: List[str]):
-        if not patterns:
-            self.regex = None
-            return
-
-        regex_parts = []
-        for pattern in patterns:
-            reg = re.escape(pattern)
-            reg = reg.replace(r'\*\*/', '(?:.*/)?')
-            reg = reg.replace(r'\*\*', '.*')
-            reg = reg.replace(r'\*', '[^/]*')
-            reg = reg.replace(r'\?', '.')
-
-            if pattern.endswith('/'):
-                reg += '.*'
-
-            if pattern.startswith('/'):
-                reg = '^' + reg[1:]
-            else:
-                reg = '(?:^|.*/)' + reg
-            
-            regex_parts.append(f'(?:{reg}$)')
-        
-        self.regex = re.compile('|'.join(regex_parts))
+        self.names, self.prefixes, globs = _split_literal_patterns(tuple(patterns))
+        self.regex = _compile_patterns(globs)
 
     def matches(self, path: str) -> bool:
+        if self.names and path.rsplit("/", 1)[-1] in self.names:
+            return True
+        for prefix in self.prefixes:
+            if path.startswith(prefix) or f"/{prefix}" in path:
+                return True
         if not self.regex:
             return False
-        return bool(self.regex.search(path))
+        return bool(self.regex.match(path))
+
+    def to_spec(self) -> dict:
+        """Serializable form, cacheable in state metadata."""
+        return {
+            "names": sorted(self.names),
+            "prefixes": list(self.prefixes),
+            "regex": self.regex.pattern if self.regex else None,
+        }
+
+    @classmethod
+    def from_spec(cls, spec: dict) -> "PatternMatcher":
+        """Rebuild a matcher from to_spec output, skipping pattern assembly."""
+        matcher = cls([])
+        matcher.names = frozenset(spec.get("names") or ())
+        matcher.prefixes = tuple(spec.get("prefixes") or ())
+        source = spec.get("regex")
+        matcher.regex = re.compile(source) if source else None
+        return matcher
+
+
+def _matcher_from_metadata(
+    metadata: dict, kind: str, patterns: List[str]
+) -> PatternMatcher:
+    """Rebuild a matcher from its cached spec, else from the raw patterns."""
+    spec = (metadata.get("compiled_patterns") or {}).get(kind)
+    if spec:
+        try:
+            return PatternMatcher.from_spec(spec)
+        except (re.error, TypeError):
+            pass  # stale or corrupt spec: assemble from patterns instead
+    return PatternMatcher(patterns)
 
 
-def select_files(
+def iter_selected(
     root: Path,
     include_patterns: List[str],
     exclude_patterns: List[str],
     exceptions: List[str],
     gitignore_patterns: List[str],
-) -> List[Path]:
-    """Select files based on patterns."""
-    selected = []
-    
-    include_matcher = PatternMatcher(include_patterns)
-    exclude_matcher = PatternMatcher(exclude_patterns)
+    include_matcher: Optional[PatternMatcher] = None,
+    exclude_matcher: Optional[PatternMatcher] = None,
+) -> Iterator[Tuple[str, os.DirEntry]]:
+    """Yield (rel_path, DirEntry) for every file matching the patterns.
+
+    Traverses with os.scandir so type checks and stats are served from the
+    cached directory entry instead of extra syscalls per file. Excluded
+    subtrees (node_modules, .venv, ...) are pruned before descent, unless
+    an exception path lives inside them. Prebuilt matchers (e.g. restored
+    from state metadata) may be passed to skip pattern assembly.
+    """
+    include_matcher = include_matcher or PatternMatcher(include_patterns)
+    exclude_matcher = exclude_matcher or PatternMatcher(exclude_patterns)
     gitignore_matcher = PatternMatcher(gitignore_patterns)
     exception_set = set(exceptions)
-    
-    root_str = str(root)
-    
-    for dirpath, dirnames, filenames in os.walk(root_str):
-        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
-        
-        rel_dir = os.path.relpath(dirpath, root_str)
-        if rel_dir == ".":
-            rel_dir = ""
-        
-        for filename in filenames:
-            rel_path = os.path.join(rel_dir, filename).replace("\\", "/")
-            if rel_path.startswith("./"):
-                rel_path = rel_path[2:]
-            
-            if gitignore_matcher.matches(rel_path):
-                continue
-            
-            if exclude_matcher.matches(rel_path):
-                if rel_path not in exception_set:
+
+    stack: List[Tuple[str, str]] = [(str(root), "")]
+    while stack:
+        dir_path, rel_dir = stack.pop()
+        try:
+            entries = os.scandir(dir_path)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                name = entry.name
+                rel_path = f"{rel_dir}/{name}" if rel_dir else name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if name.startswith("."):
+                            continue
+                        if gitignore_matcher.matches(
+                            rel_path + "/"
+                        ) or exclude_matcher.matches(rel_path + "/"):
+                            if not any(
+                                exc == rel_path or exc.startswith(rel_path + "/")
+                                for exc in exception_set
+                            ):
+                                continue
+                        stack.append((entry.path, rel_path))
+                        continue
+                    if entry.is_dir():  # symlinked dir: don't descend or select
+                        continue
+                except OSError:
                     continue
-            
-            if include_matcher.matches(rel_path) or rel_path in exception_set:
-                selected.append(root / rel_path)
-    
-    return sorted(selected)
+
+                if gitignore_matcher.matches(rel_path):
+                    continue
+
+                if exclude_matcher.matches(rel_path):
+                    if rel_path not in exception_set:
+                        continue
+
+                if include_matcher.matches(rel_path) or rel_path in exception_set:
+                    yield rel_path, entry
+
+
+def select_files(
+    root: Path,
+    include_patterns: List[str],
+    exclude_patterns: List[str],
+    exceptions: List[str],
+    gitignore_patterns: List[str],
+) -> List[str]:
+    """Select files based on patterns, as root-relative path strings.
+
+    Order follows the traversal; callers that need sorted output (e.g.
+    reports) sort the subset they print.
+    """
+    return [
+        rel_path
+        for rel_path, _ in iter_selected(
+            root, include_patterns, exclude_patterns, exceptions, gitignore_patterns
+        )
+    ]
+
+
+SMALL_FILE_HASH_SIZE = 4 << 10  # below this, one read beats mmap setup cost
+MMAP_HASH_MAX_SIZE = 512 << 20  # beyond this, mapping risks address-space pressure
+PIPELINE_BUF_SIZE = 4 << 20  # per-buffer size for the streaming read pipeline
+
+
+def _hash_stream_pipelined(f) -> str:
+    """Hash a stream by overlapping reads with digest updates.
+
+    A reader thread fills two ping-pong buffers while the caller's thread
+    folds completed chunks into the hasher, so disk latency is hidden
+    behind hashing CPU on files too large to mmap.
+    """
+    hasher = new_hasher()
+    filled: queue.Queue = queue.Queue(maxsize=2)
+    free: queue.Queue = queue.Queue()
+    for _ in range(2):
+        free.put(bytearray(PIPELINE_BUF_SIZE))
+
+    def reader() -> None:
+        while True:
+            buf = free.get()
+            try:
+                n = f.readinto(buf)
+            except OSError:
+                n = -1
+            filled.put((buf, n))
+            if n <= 0:
+                return
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    while True:
+        buf, n = filled.get()
+        if n < 0:
+            thread.join()
+            raise IOError(f"read failed: {getattr(f, 'name', '?')}")
+        if n == 0:
+            break
+        hasher.update(memoryview(buf)[:n])
+        free.put(buf)
+    thread.join()
+    return hasher.hexdigest()
 
 
-def compute_file_hash(filepath: Path) -> str:
-    """Compute MD5 hash of file content."""
-    hasher = hashlib.md5()
+def compute_file_hash(filepath: Union[str, Path]) -> str:
+    """Compute the content digest of a file (see HASH_ALGO)."""
     try:
-        with open(filepath, "rb") as f:
-            for chunk in iter(lambda: f.read(8192), b""):
-                hasher.update(chunk)
-        return hasher.hexdigest()
+        with open(filepath, "rb", buffering=0) as f:
+            fd = f.fileno()
+            size = os.fstat(fd).st_size
+            if size <= SMALL_FILE_HASH_SIZE:
+                return new_hasher(f.read()).hexdigest()
+            if hasattr(os, "posix_fadvise"):
+                # One sequential sweep: prime read-ahead beyond the default.
+                os.posix_fadvise(
+                    fd, 0, 0, os.POSIX_FADV_SEQUENTIAL | os.POSIX_FADV_WILLNEED
+                )
+            if size <= MMAP_HASH_MAX_SIZE:
+                try:
+                    with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+                        hasher = new_hasher()
+                        hasher.update(memoryview(mm))
+                        return hasher.hexdigest()
+                except (ValueError, OSError):
+                    pass  # e.g. special files; fall through to streaming
+            digest = _hash_stream_pipelined(f)
+            if hasattr(os, "posix_fadvise"):
+                # Large artifacts are read once; don't let them evict hot pages.
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            return digest
     except (IOError, OSError):
         return ""
 
 
+def _hash_one(paths: Tuple[str, str]) -> Tuple[str, str]:
+    """Hash one (abs_path, rel_path) pair; map-friendly worker unit."""
+    abs_path, rel_path = paths
+    return rel_path, compute_file_hash(abs_path)
+
+
+def hash_files(
+    entries: Iterable[Tuple[str, os.DirEntry]],
+    prev_records: Optional[Dict[str, dict]] = None,
+    hash_cache: Optional[Dict[str, str]] = None,
+) -> Dict[str, dict]:
+    """Hash selected entries into {path: {md5, size, mtime_ns}} records.
+
+    Consumes the traversal generator directly, so selection and hashing
+    run as one pass. Stats are served from the cached DirEntry. Files
+    whose size and mtime_ns match their previous record, or whose
+    (dev, ino, size, mtime_ns) key is in hash_cache, keep the known hash
+    without being re-read; only misses are hashed, in parallel when there
+    are enough. hash_cache is pruned in place to the files seen this run.
+    """
+    prev_records = prev_records or {}
+    records: Dict[str, dict] = {}
+    fresh_cache: Dict[str, str] = {}
+    to_hash: List[Tuple[str, str, int, int, str]] = []
+
+    for rel_path, entry in entries:
+        try:
+            st = entry.stat()
+        except OSError:
+            records[rel_path] = {"md5": "", "size": 0, "mtime_ns": 0}
+            continue
+
+        key = _cache_key(st)
+        prev = prev_records.get(rel_path)
+        if (
+            prev
+            and prev.get("size") == st.st_size
+            and prev.get("mtime_ns") == st.st_mtime_ns
+        ):
+            records[rel_path] = {
+                "md5": prev["md5"],
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+            }
+            if prev["md5"]:  # never cache the empty error digest
+                fresh_cache[key] = prev["md5"]
+        elif hash_cache is not None and hash_cache.get(key):
+            records[rel_path] = {
+                "md5": hash_cache[key],
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+            }
+            fresh_cache[key] = hash_cache[key]
+        else:
+            to_hash.append((entry.path, rel_path, st.st_size, st.st_mtime_ns, key))
+
+    pairs = [(abs_path, rel_path) for abs_path, rel_path, _, _, _ in to_hash]
+    if len(pairs) < PARALLEL_HASH_MIN_FILES:
+        digests = dict(map(_hash_one, pairs))
+    else:
+        with ThreadPoolExecutor(max_workers=HASH_QUEUE_DEPTH) as executor:
+            digests = dict(executor.map(_hash_one, pairs))
+
+    for _, rel_path, size, mtime_ns, key in to_hash:
+        digest = digests[rel_path]
+        records[rel_path] = {"md5": digest, "size": size, "mtime_ns": mtime_ns}
+        if digest:  # never cache the empty error digest
+            fresh_cache[key] = digest
+
+    if hash_cache is not None:
+        hash_cache.clear()
+        hash_cache.update(fresh_cache)
+    return records
+
+
+def _cache_key(st: os.stat_result) -> str:
+    """Identity of one file version: same inode and same content stamp."""
+    return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def load_hash_cache(root: Path) -> Dict[str, str]:
+    """Load the inode-keyed digest cache shared across invocations.
+
+    Unlike the per-state records, this survives a fresh init or a branch
+    switch: any file version hashed before is found by its
+    (dev, ino, size, mtime_ns) key. Digests from another algorithm are
+    discarded wholesale.
+    """
+    cache_path = root / STATE_DIR / HASH_CACHE_FILE
+    if cache_path.exists():
+        try:
+            with open(cache_path, "rb") as f:
+                data = f.read()
+            cache = orjson.loads(data) if orjson is not None else json.loads(data)
+        except (ValueError, IOError):
+            return {}
+        if isinstance(cache, dict) and cache.get("algo") == HASH_ALGO:
+            return cache.get("entries", {})
+    return {}
+
+
+def save_hash_cache(root: Path, entries: Dict[str, str]) -> None:
+    """Persist the inode-keyed digest cache (best effort)."""
+    state_dir = root / STATE_DIR
+    try:
+        state_dir.mkdir(parents=True, exist_ok=True)
+        cache = {"algo": HASH_ALGO, "entries": entries}
+        if orjson is not None:
+            with open(state_dir / HASH_CACHE_FILE, "wb") as f:
+                f.write(orjson.dumps(cache))
+        else:
+            with open(state_dir / HASH_CACHE_FILE, "w", encoding="utf-8") as f:
+                json.dump(cache, f, separators=(",", ":"))
+    except (IOError, OSError):
+        pass
+
+
+def load_file_records(state: dict) -> Dict[str, dict]:
+    """Load saved file records, migrating the legacy {path: md5} schema."""
+    saved = state.get("file_hashes", {})
+    return {
+        path: entry if isinstance(entry, dict) else {"md5": entry}
+        for path, entry in saved.items()
+    }
+
+
+def file_digests(records: Dict[str, dict]) -> Dict[str, str]:
+    """Flatten file records to the {path: md5} view used for folder hashing."""
+    return {path: record.get("md5", "") for path, record in records.items()}
+
+
+def build_folder_index(file_hashes: Dict[str, str]) -> Dict[str, List[Tuple[str, str]]]:
+    """Group (path, hash) entries under every ancestor folder in one pass.
+
+    Root-level files are grouped under ".".
+    """
+    by_folder: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+    for path, hash_val in file_hashes.items():
+        parts = path.split("/")
+        if len(parts) == 1:
+            by_folder["."].append((path, hash_val))
+        else:
+            for i in range(1, len(parts)):
+                by_folder["/".join(parts[:i])].append((path, hash_val))
+    return by_folder
+
+
 def compute_folder_hash(folder: str, file_hashes: Dict[str, str]) -> str:
     """Compute hash for a folder based on its files."""
-    folder_files = sorted(
-        (path, hash_val)
-        for path, hash_val in file_hashes.items()
-        if path.startswith(folder + "/") or (folder == "." and "/" not in path)
-    )
-    
-    if not folder_files:
-        return ""
-    
-    hasher = hashlib.md5()
-    for path, hash_val in folder_files:
-        hasher.update(f"{path}:{hash_val}\n".encode())
-    return hasher.hexdigest()
+    return compute_folder_hashes(file_hashes, only={folder}).get(folder, "")
+
+
+def compute_folder_hashes(
+    file_hashes: Dict[str, str], only: Optional[Set[str]] = None
+) -> Dict[str, str]:
+    """Compute folder hashes from a folder index built in a single pass.
 
+    Each folder's sorted entries are hashed once. When `only` is given,
+    digests are computed just for those folders.
+    """
+    by_folder = build_folder_index(file_hashes)
 
-def get_folders_with_files(files: List[Path], root: Path) -> Set[str]:
+    folder_hashes: Dict[str, str] = {}
+    for folder, entries in by_folder.items():
+        if only is not None and folder not in only:
+            continue
+        entries.sort()
+        hasher = new_hasher()
+        for path, hash_val in entries:
+            hasher.update(f"{path}:{hash_val}\n".encode())
+        folder_hashes[folder] = hasher.hexdigest()
+    return folder_hashes
+
+
+def get_folders_with_files(rel_paths: Iterable[str]) -> Set[str]:
     """Get all folders containing selected files."""
-    folders = set()
-    for f in files:
-        rel = f.relative_to(root)
-        parts = rel.parts[:-1]
+    folders = {"."}
+    for rel in rel_paths:
+        parts = rel.split("/")[:-1]
         for i in range(len(parts)):
             folders.add("/".join(parts[: i + 1]))
-    folders.add(".")
     return folders
 
 
@@ -164,21 +531,35 @@ def load_state(root: Path) -> Optional[dict]:
     state_path = root / STATE_DIR / STATE_FILE
     if state_path.exists():
         try:
-            with open(state_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
+            with open(state_path, "rb") as f:
+                data = f.read()
+            return orjson.loads(data) if orjson is not None else json.loads(data)
+        except (ValueError, IOError):
             return None
     return None
 
 
 def save_state(root: Path, state: dict) -> None:
-    """Save cartography state."""
+    """Save cartography state.
+
+    Written compact by default; set CARTOGRAPHER_PRETTY_STATE for an
+    indented file when debugging.
+    """
     state_dir = root / STATE_DIR
     state_dir.mkdir(parents=True, exist_ok=True)
-    
+
     state_path = state_dir / STATE_FILE
-    with open(state_path, "w", encoding="utf-8") as f:
-        json.dump(state, f, indent=2)
+    pretty = bool(os.environ.get("CARTOGRAPHER_PRETTY_STATE"))
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        with open(state_path, "wb") as f:
+            f.write(orjson.dumps(state, option=option))
+    else:
+        with open(state_path, "w", encoding="utf-8") as f:
+            if pretty:
+                json.dump(state, f, indent=2)
+            else:
+                json.dump(state, f, separators=(",", ":"))
 
 
 def create_empty_codemap(folder_path: Path, folder_name: str) -> None:
@@ -216,36 +597,51 @@ def cmd_init(args: argparse.Namespace) -> int:
     exclude_patterns = args.exclude or []
     exceptions = args.exception or []
     
+    include_matcher = PatternMatcher(include_patterns)
+    exclude_matcher = PatternMatcher(exclude_patterns)
+
     print(f"Scanning {root}...")
-    selected_files = select_files(
-        root, include_patterns, exclude_patterns, exceptions, gitignore
+    hash_cache = load_hash_cache(root)
+    file_records = hash_files(
+        iter_selected(
+            root,
+            include_patterns,
+            exclude_patterns,
+            exceptions,
+            gitignore,
+            include_matcher,
+            exclude_matcher,
+        ),
+        hash_cache=hash_cache,
     )
-    print(f"Selected {len(selected_files)} files")
-    
-    file_hashes: Dict[str, str] = {}
-    for f in selected_files:
-        rel_path = str(f.relative_to(root))
-        file_hashes[rel_path] = compute_file_hash(f)
-    
-    folders = get_folders_with_files(selected_files, root)
-    folder_hashes: Dict[str, str] = {}
-    for folder in folders:
-        folder_hashes[folder] = compute_folder_hash(folder, file_hashes)
-    
+    print(f"Selected {len(file_records)} files")
+
+    file_hashes = file_digests(file_records)
+
+    folders = get_folders_with_files(file_records)
+    folder_hashes = {folder: "" for folder in folders}
+    folder_hashes.update(compute_folder_hashes(file_hashes))
+
     state = {
         "metadata": {
             "version": VERSION,
+            "hash_algo": HASH_ALGO,
             "last_run": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
             "root": str(root),
             "include_patterns": include_patterns,
             "exclude_patterns": exclude_patterns,
             "exceptions": exceptions,
+            "compiled_patterns": {
+                "include": include_matcher.to_spec(),
+                "exclude": exclude_matcher.to_spec(),
+            },
         },
-        "file_hashes": file_hashes,
+        "file_hashes": file_records,
         "folder_hashes": folder_hashes,
     }
     
     save_state(root, state)
+    save_hash_cache(root, hash_cache)
     print(f"Created {STATE_DIR}/{STATE_FILE}")
     
     for folder in folders:
@@ -276,21 +672,37 @@ def cmd_changes(args: argparse.Namespace) -> int:
     exceptions = metadata.get("exceptions", [])
     
     gitignore = load_gitignore(root)
-    current_files = select_files(
-        root, include_patterns, exclude_patterns, exceptions, gitignore
+    current = iter_selected(
+        root,
+        include_patterns,
+        exclude_patterns,
+        exceptions,
+        gitignore,
+        _matcher_from_metadata(metadata, "include", include_patterns),
+        _matcher_from_metadata(metadata, "exclude", exclude_patterns),
     )
-    
-    current_hashes: Dict[str, str] = {}
-    for f in current_files:
-        rel_path = str(f.relative_to(root))
-        current_hashes[rel_path] = compute_file_hash(f)
-    
-    saved_hashes = state.get("file_hashes", {})
-    
-    added = set(current_hashes.keys()) - set(saved_hashes.keys())
-    removed = set(saved_hashes.keys()) - set(current_hashes.keys())
+
+    saved_records = load_file_records(state)
+    saved_algo = metadata.get("hash_algo", "md5")
+    if saved_algo != HASH_ALGO:
+        # Saved digests use a different algorithm: they can neither seed the
+        # stat cache nor be compared, so every common file shows as modified.
+        print(
+            f"Warning: hash algorithm changed ({saved_algo} -> {HASH_ALGO}), "
+            "run 'update' to re-baseline",
+            file=sys.stderr,
+        )
+        saved_records = {path: {} for path in saved_records}
+    hash_cache = load_hash_cache(root)
+    current_hashes = file_digests(hash_files(current, saved_records, hash_cache))
+    save_hash_cache(root, hash_cache)
+    saved_hashes = file_digests(saved_records)
+
+    added = current_hashes.keys() - saved_hashes.keys()
+    removed = saved_hashes.keys() - current_hashes.keys()
     modified = {
-        path for path in current_hashes.keys() & saved_hashes.keys()
+        path
+        for path in current_hashes.keys() & saved_hashes.keys()
         if current_hashes[path] != saved_hashes[path]
     }
     
@@ -315,7 +727,7 @@ def cmd_changes(args: argparse.Namespace) -> int:
     
     affected = set()
     for path in added | removed | modified:
-        parts = Path(path).parts[:-1]
+        parts = path.split("/")[:-1]
         for i in range(len(parts)):
             affected.add("/".join(parts[: i + 1]))
         affected.add(".")
@@ -342,25 +754,65 @@ def cmd_update(args: argparse.Namespace) -> int:
     exceptions = metadata.get("exceptions", [])
     
     gitignore = load_gitignore(root)
-    selected_files = select_files(
-        root, include_patterns, exclude_patterns, exceptions, gitignore
+    prev_records = load_file_records(state)
+    if metadata.get("hash_algo", "md5") != HASH_ALGO:
+        prev_records = {}  # different digest algorithm: rehash everything
+    include_matcher = _matcher_from_metadata(metadata, "include", include_patterns)
+    exclude_matcher = _matcher_from_metadata(metadata, "exclude", exclude_patterns)
+
+    hash_cache = load_hash_cache(root)
+    file_records = hash_files(
+        iter_selected(
+            root,
+            include_patterns,
+            exclude_patterns,
+            exceptions,
+            gitignore,
+            include_matcher,
+            exclude_matcher,
+        ),
+        prev_records,
+        hash_cache,
     )
-    
-    file_hashes: Dict[str, str] = {}
-    for f in selected_files:
-        rel_path = str(f.relative_to(root))
-        file_hashes[rel_path] = compute_file_hash(f)
-    
-    folders = get_folders_with_files(selected_files, root)
+    file_hashes = file_digests(file_records)
+
+    prev_hashes = file_digests(prev_records)
+    changed = (file_hashes.keys() ^ prev_hashes.keys()) | {
+        path
+        for path in file_hashes.keys() & prev_hashes.keys()
+        if file_hashes[path] != prev_hashes[path]
+    }
+    dirty: Set[str] = set()
+    for path in changed:
+        parts = path.split("/")[:-1]
+        if not parts:
+            dirty.add(".")
+        for i in range(len(parts)):
+            dirty.add("/".join(parts[: i + 1]))
+
+    folders = get_folders_with_files(file_records)
+    old_folder_hashes = state.get("folder_hashes", {})
     folder_hashes: Dict[str, str] = {}
+    recompute: Set[str] = set()
     for folder in folders:
-        folder_hashes[folder] = compute_folder_hash(folder, file_hashes)
+        if folder in dirty or folder not in old_folder_hashes:
+            recompute.add(folder)
+            folder_hashes[folder] = ""
+        else:
+            folder_hashes[folder] = old_folder_hashes[folder]
+    folder_hashes.update(compute_folder_hashes(file_hashes, only=recompute))
     
+    state["metadata"]["hash_algo"] = HASH_ALGO
+    state["metadata"]["compiled_patterns"] = {
+        "include": include_matcher.to_spec(),
+        "exclude": exclude_matcher.to_spec(),
+    }
     state["metadata"]["last_run"] = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
-    state["file_hashes"] = file_hashes
+    state["file_hashes"] = file_records
     state["folder_hashes"] = folder_hashes
     
     save_state(root, state)
+    save_hash_cache(root, hash_cache)
     print(f"Updated {STATE_DIR}/{STATE_FILE} ({len(file_hashes)} files)")
     return 0
 